@@ -1,18 +1,34 @@
 import streamlit as st
-import markdown
+try:
+    import pyromark
+except ImportError:
+    # Pure-Python fallback when the pyromark (Rust) wheel is unavailable
+    pyromark = None
+    import mistune
+try:
+    import pypdf
+except ImportError:
+    # Optional: only needed to split very large documents
+    pypdf = None
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    BaseDocTemplate, Frame, PageTemplate, Paragraph, Spacer, Table, TableStyle
 )
+from reportlab.platypus.paragraph import cleanBlockQuotedText
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
 from reportlab.lib import colors
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-from io import BytesIO
+from reportlab.pdfgen.canvas import Canvas
+from io import BytesIO, RawIOBase, StringIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from html import unescape
+from html.entities import html5
+import functools
+import os
 import re
-from html.parser import HTMLParser
 
 # ==========================================
 # 1. CONFIGURATION: MAPPING CSS TO PYTHON
@@ -30,77 +46,432 @@ PRE_BLOCK_TEXT = '#ffffff'
 QUOTE_COLOR = '#666666'
 TABLE_HEAD_BG = '#f4f4f4'
 TABLE_BORDER = '#dddddd'
+FOOTER_COLOR = '#888888'
+
+# Parsed once at import instead of on every conversion
+H1_COLOR_OBJ = colors.HexColor(H1_COLOR)
+H2_COLOR_OBJ = colors.HexColor(H2_COLOR)
+H3_COLOR_OBJ = colors.HexColor(H3_COLOR)
+BODY_COLOR_OBJ = colors.HexColor(BODY_COLOR)
+PRE_BLOCK_BG_OBJ = colors.HexColor(PRE_BLOCK_BG)
+PRE_BLOCK_TEXT_OBJ = colors.HexColor(PRE_BLOCK_TEXT)
+QUOTE_COLOR_OBJ = colors.HexColor(QUOTE_COLOR)
+TABLE_HEAD_BG_OBJ = colors.HexColor(TABLE_HEAD_BG)
+TABLE_BORDER_OBJ = colors.HexColor(TABLE_BORDER)
+FOOTER_COLOR_OBJ = colors.HexColor(FOOTER_COLOR)
+
+# With chunked=True, documents at least this long are rendered in parallel
+# chunks (needs pypdf)
+CHUNK_MIN_CHARS = 100_000
+
+# Deepest list nesting with its own indentation
+MAX_LIST_LEVEL = 6
+
+# Markdown features: tables, ~~strikethrough~~ and task lists
+if pyromark is not None:
+    MARKDOWN_OPTIONS = (
+        pyromark.Options.ENABLE_TABLES
+        | pyromark.Options.ENABLE_STRIKETHROUGH
+        | pyromark.Options.ENABLE_TASKLISTS
+    )
+else:
+    MISTUNE_MARKDOWN = mistune.create_markdown(
+        renderer='ast', plugins=['table', 'strikethrough', 'task_lists']
+    )
 
 # Fonts
-# Logic: Try to register Barlow/FiraCode. If files missing, fallback to Helvetica/Courier.
-try:
-    # If you have the .ttf files in the same folder, this works.
-    # Otherwise it falls back to the except block.
-    pdfmetrics.registerFont(TTFont('Barlow', 'Barlow-Regular.ttf'))
-    pdfmetrics.registerFont(TTFont('Barlow-Bold', 'Barlow-Bold.ttf'))
-    pdfmetrics.registerFont(TTFont('FiraCode', 'FiraCode-Regular.ttf'))
-    BODY_FONT = 'Barlow'
-    HEAD_FONT = 'Barlow-Bold'
-    MONO_FONT = 'FiraCode'
-except:
-    BODY_FONT = 'Helvetica'
-    HEAD_FONT = 'Helvetica-Bold'
-    MONO_FONT = 'Courier'
+# Logic: Register Barlow/FiraCode if the .ttf files are in the same folder.
+# If any file is missing, fallback to Helvetica/Courier.
+FONT_FILES = {
+    'Barlow': 'Barlow-Regular.ttf',
+    'Barlow-Bold': 'Barlow-Bold.ttf',
+    'FiraCode': 'FiraCode-Regular.ttf',
+}
+
+@st.cache_resource
+def get_fonts():
+    """Registers the fonts and returns (body, head, mono). Cached across Streamlit reruns."""
+    if all(os.path.exists(path) for path in FONT_FILES.values()):
+        for name, path in FONT_FILES.items():
+            pdfmetrics.registerFont(TTFont(name, path))
+        return 'Barlow', 'Barlow-Bold', 'FiraCode'
+    return 'Helvetica', 'Helvetica-Bold', 'Courier'
+
+BODY_FONT, HEAD_FONT, MONO_FONT = get_fonts()
 
 # ==========================================
 # 2. MARKDOWN PROCESSING
 # ==========================================
 
-def preprocess_markdown(text):
-    """Fixes Markdown list spacing for the parser."""
-    lines = text.split('\n')
-    result = []
-    for i, line in enumerate(lines):
-        # Detect lists
-        is_list = bool(re.match(r'^[\s]*[\*\-]\s', line)) or bool(re.match(r'^[\s]*\d+\.\s', line))
-        # Ensure blank line before list starts
-        if is_list and i > 0 and lines[i-1].strip() != '':
-            result.append('')
-        result.append(line)
-    return '\n'.join(result)
+# Start of a line holding a list item marker: "* ", "- " or "1. "
+LIST_LINE_RE = re.compile(r'\n(?=[^\S\n]*(?:[*\-]|\d+\.)[^\S\n])')
+
+def is_list_item(line):
+    """True if the line starts with a list marker, using plain str checks."""
+    s = line.lstrip()
+    if len(s) < 2:
+        return False
+    if s[0] in '*-':
+        return s[1].isspace()
+    i = 0
+    while i < len(s) and s[i].isdecimal():
+        i += 1
+    return 0 < i < len(s) - 1 and s[i] == '.' and s[i + 1].isspace()
 
-def add_footer(canvas, doc):
-    """Adds a footer to every page."""
+def preprocess_markdown(text):
+    """Fixes Markdown list spacing for the parser.
+
+    Inserts a blank line between text and a list that directly follows it;
+    consecutive list items stay tight. The regex only stops at list lines,
+    so ordinary lines are never examined in Python.
+    """
+    pieces = []
+    last = 0
+    for match in LIST_LINE_RE.finditer(text):
+        pos = match.start()
+        prev = text[text.rfind('\n', 0, pos) + 1:pos]
+        if prev.strip() and not is_list_item(prev):
+            pieces.append(text[last:pos])
+            pieces.append('\n')
+            last = pos
+    if not pieces:
+        return text
+    pieces.append(text[last:])
+    return ''.join(pieces)
+
+def markdown_events(text):
+    """Parses Markdown into a pyromark-style event stream."""
+    if pyromark is not None:
+        return pyromark.events(text, options=MARKDOWN_OPTIONS)
+    return mistune_events(MISTUNE_MARKDOWN(text))
+
+# mistune AST node types that map to a plain Start/End pair of events
+MISTUNE_CONTAINERS = {
+    'paragraph': 'Paragraph',
+    'block_quote': 'BlockQuote',
+    'list_item': 'Item',
+    'table': 'Table',
+    'table_head': 'TableHead',
+    'table_row': 'TableRow',
+    'table_cell': 'TableCell',
+    'strong': 'Strong',
+    'emphasis': 'Emphasis',
+    'strikethrough': 'Strikethrough',
+}
+
+# Complete character references; CommonMark leaves anything else literal
+ENTITY_RE = re.compile(r'&(#\d+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);')
+
+def decode_entity(match):
+    name = match.group(1)
+    if name[0] == '#':
+        return unescape(match.group(0))
+    return html5.get(name + ';', match.group(0))
+
+def unescape_entities(text):
+    """Decodes character references the way CommonMark does.
+
+    html.unescape also decodes legacy names without a semicolon and by
+    prefix (&copy2024), which CommonMark keeps as written.
+    """
+    if '&' not in text:
+        return text
+    return ENTITY_RE.sub(decode_entity, text)
+
+def mistune_events(nodes):
+    """Walks a mistune AST, yielding the events pyromark would produce."""
+    for node in nodes:
+        kind = node['type']
+        if kind == 'text':
+            # mistune keeps entities such as &copy; as written; pyromark
+            # decodes them, so do the same (once per text node)
+            yield {'Text': unescape_entities(node['raw'])}
+        elif kind == 'codespan':
+            yield {'Code': node['raw']}
+        elif kind == 'block_code':
+            yield {'Start': 'CodeBlock'}
+            yield {'Text': node['raw']}
+            yield {'End': 'CodeBlock'}
+        elif kind == 'heading':
+            level = f"H{node['attrs']['level']}"
+            yield {'Start': {'Heading': {'level': level}}}
+            yield from mistune_events(node['children'])
+            yield {'End': {'Heading': level}}
+        elif kind == 'list':
+            ordered = node['attrs']['ordered']
+            start = node['attrs'].get('start', 1) if ordered else None
+            yield {'Start': {'List': start}}
+            yield from mistune_events(node['children'])
+            yield {'End': {'List': ordered}}
+        elif kind == 'task_list_item':
+            yield {'Start': 'Item'}
+            yield {'TaskListMarker': node['attrs']['checked']}
+            yield from mistune_events(node['children'])
+            yield {'End': 'Item'}
+        elif kind in MISTUNE_CONTAINERS:
+            name = MISTUNE_CONTAINERS[kind]
+            yield {'Start': name}
+            yield from mistune_events(node['children'])
+            yield {'End': name}
+        elif kind == 'softbreak':
+            yield 'SoftBreak'
+        elif kind == 'linebreak':
+            yield 'HardBreak'
+        elif kind == 'block_html':
+            yield {'Html': node['raw']}
+        elif kind == 'inline_html':
+            yield {'InlineHtml': node['raw']}
+        elif 'children' in node:
+            # block_text, table_body, link, image, ...: only the content
+            yield from mistune_events(node['children'])
+
+def split_markdown(text, parts):
+    """Splits Markdown into about `parts` chunks of similar size.
+
+    Chunks only break before a '## ' heading outside fenced code blocks.
+    """
+    target = len(text) / parts
+    chunks = []
+    start = pos = 0
+    in_fence = False
+    for line in text.splitlines(keepends=True):
+        if line.lstrip().startswith(('```', '~~~')):
+            in_fence = not in_fence
+        elif not in_fence and line.startswith('## ') and pos - start >= target:
+            chunks.append(text[start:pos])
+            start = pos
+        pos += len(line)
+    chunks.append(text[start:])
+    return chunks
+
+def draw_footer(canvas, page_number):
     canvas.saveState()
     page_width, page_height = A4
     canvas.setFont(BODY_FONT, 8)
-    canvas.setFillColor(colors.HexColor('#888888'))
+    canvas.setFillColor(FOOTER_COLOR_OBJ)
     canvas.drawString(2 * cm, 1.0 * cm, "Generated Report")
-    canvas.drawRightString(page_width - 2 * cm, 1.0 * cm, f"Page {doc.page}")
+    canvas.drawRightString(page_width - 2 * cm, 1.0 * cm, f"Page {page_number}")
     canvas.restoreState()
 
+def add_footer(canvas, doc):
+    """Adds a footer to every page."""
+    draw_footer(canvas, doc.page)
+
+def no_footer(canvas, doc):
+    """Page callback for chunks; their footers are stamped after merging."""
+
 # ==========================================
-# 3. HTML TO PDF PARSER
+# 3. MARKDOWN EVENTS TO PDF PARSER
 # ==========================================
 
-class CSSStyleParser(HTMLParser):
+# pyromark event names -> the HTML tag they would have rendered as
+EVENT_TAGS = {
+    'Paragraph': 'p',
+    'BlockQuote': 'blockquote',
+    'CodeBlock': 'pre',
+    'Item': 'li',
+    'Table': 'table',
+    'TableHead': 'tr',
+    'TableRow': 'tr',
+    'Strong': 'strong',
+    'Emphasis': 'em',
+    'Strikethrough': 'del',
+}
+
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+# Characters ReportLab's paragraph markup treats as special
+XML_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+
+# Tags inside raw HTML embedded in the Markdown, e.g. <br> or <b>; comments
+# (possibly unterminated), declarations and processing instructions match
+# without a tag name so they can be skipped
+HTML_TAG_RE = re.compile(
+    r'<!--.*?(?:-->|\Z)|<[!?][^>]*>|<(/?)([a-zA-Z][a-zA-Z0-9]*)[^>]*>', re.S
+)
+
+# Inline tags -> the ReportLab markup that opens and closes them
+INLINE_TAGS = {
+    'strong': ('<b>', '</b>'),
+    'b': ('<b>', '</b>'),
+    'em': ('<i>', '</i>'),
+    'i': ('<i>', '</i>'),
+    'del': ('<strike>', '</strike>'),
+    's': ('<strike>', '</strike>'),
+    'code': (f'<font face="{MONO_FONT}" color="{CODE_INLINE_TEXT}" backColor="{CODE_INLINE_BG}">', '</font>'),
+}
+
+@functools.lru_cache(maxsize=64)
+def plain_frag(style):
+    """The fragment ReportLab's parser produces for markup-free text."""
+    return Paragraph('x', style).frags[0]
+
+def plain_paragraph(text, style):
+    """Paragraph for escaped text without markup, built without parsing it.
+
+    The fragment comes from plain_frag(), so fonts and colors are exactly
+    what the parser would have produced; only the text is swapped in.
+    """
+    text = cleanBlockQuotedText(unescape(text))
+    return Paragraph(text, style, frags=[plain_frag(style).clone(text=text)])
+
+@functools.lru_cache(maxsize=256)
+def parsed_paragraph(text, style):
+    """A parsed Paragraph kept as the template for repeats of the same text."""
+    return Paragraph(text, style)
+
+def markup_paragraph(text, style):
+    """Paragraph for text with inline markup, parsed once per text and style.
+
+    Repeated cells and list items in generated reports reuse the cached
+    parse; each copy gets its own fragment clones.
+    """
+    para = parsed_paragraph(text, style)
+    return Paragraph(para.text, para.style, bulletText=para.bulletText,
+                     frags=[frag.clone() for frag in para.frags])
+
+class CSSStyleParser:
+    """Builds ReportLab flowables from a pyromark event stream.
+
+    Events are translated to the equivalent HTML tags, so there is no
+    intermediate HTML string to serialize and re-tokenize.
+    """
     def __init__(self, styles):
-        super().__init__()
         self.styles = styles
+        # Indexed by heading level, so 'h2' -> heading_styles[2]
+        self.heading_styles = (None,) + tuple(
+            styles[f'CustomH{level}'] for level in range(1, 7)
+        )
+        self.current_text = StringIO()
+        self.curr_cell = StringIO()
+        self.reset()
+
+    def reset(self):
+        """Starts with empty document state."""
         self.story = []
-        self.current_text = []
+        self.current_text.seek(0)
+        self.current_text.truncate()
+        self.text_markup = False # Current paragraph has inline markup
+        self.open_tags = [] # (closing markup, from raw HTML, offset, length)
+        self.in_comment = False # Inside an HTML comment spanning Html events
         
         # State tracking
         self.list_stack = [] # Stores 'ul' or 'ol'
         self.list_counters = [] # Stores integers for 'ol'
+        self.item_bullet = None # Bullet of the current item, until it is drawn
         self.in_pre = False     # Inside <pre> block
         
         # Table tracking
         self.in_table = False
         self.rows = []
         self.curr_row = []
-        self.curr_cell = []
+        self.curr_cell.seek(0)
+        self.curr_cell.truncate()
         self.in_th = False
+        self.in_head = False    # Inside the table header row
+        self.cell_markup = False # Current cell has inline markup
+
+    def feed(self, events):
+        for event in events:
+            # Unit events are plain strings: SoftBreak, HardBreak, Rule
+            if isinstance(event, str):
+                if event == 'SoftBreak':
+                    self.handle_data('\n')
+                elif event == 'HardBreak':
+                    self.handle_starttag('br')
+                continue
+
+            kind, value = next(iter(event.items()))
+            if kind == 'Text':
+                self.handle_data(value)
+            elif kind == 'Code':
+                self.handle_starttag('code')
+                self.handle_data(value)
+                self.handle_endtag('code')
+            elif kind == 'Start':
+                self.handle_start_event(value)
+            elif kind == 'End':
+                self.handle_end_event(value)
+            elif kind == 'TaskListMarker':
+                self.handle_data('[x] ' if value else '[ ] ')
+            elif kind in ('Html', 'InlineHtml'):
+                self.handle_html(value)
+
+    def handle_start_event(self, value):
+        if isinstance(value, str):
+            name, payload = value, None
+        else:
+            name, payload = next(iter(value.items()))
+
+        if name == 'Heading':
+            self.handle_starttag(payload['level'].lower())
+        elif name == 'List':
+            # payload is the start number of an ordered list, None for bullets
+            self.handle_starttag('ul' if payload is None else 'ol')
+            if payload is not None:
+                self.list_counters[-1] = payload - 1
+        elif name == 'TableHead':
+            self.in_head = True
+            self.handle_starttag('tr')
+        elif name == 'TableCell':
+            self.handle_starttag('th' if self.in_head else 'td')
+        elif name in EVENT_TAGS:
+            self.handle_starttag(EVENT_TAGS[name])
+
+    def handle_end_event(self, value):
+        if isinstance(value, str):
+            name, payload = value, None
+        else:
+            name, payload = next(iter(value.items()))
+
+        if name == 'Heading':
+            self.handle_endtag(payload.lower())
+        elif name == 'List':
+            # payload is True for ordered lists
+            self.handle_endtag('ol' if payload else 'ul')
+        elif name == 'TableHead':
+            self.handle_endtag('tr')
+            self.in_head = False
+        elif name == 'TableCell':
+            self.handle_endtag('th' if self.in_head else 'td')
+        elif name in EVENT_TAGS:
+            self.handle_endtag(EVENT_TAGS[name])
+
+    def handle_html(self, html):
+        """Raw HTML in the Markdown: keep its text and the tags we support.
+
+        Comments, declarations, processing instructions and block tags are
+        dropped.
+        """
+        pos = 0
+        if self.in_comment:
+            pos = html.find('-->')
+            if pos < 0: return
+            self.in_comment = False
+            pos += 3
+        for match in HTML_TAG_RE.finditer(html, pos):
+            self.handle_data(unescape(html[pos:match.start()]))
+            pos = match.end()
+            tag = match.group(2)
+            if tag is None:
+                markup = match.group(0)
+                if markup.startswith('<!--') and not markup.endswith('-->'):
+                    self.in_comment = True
+                continue
+            tag = tag.lower()
+            if tag not in INLINE_TAGS and tag != 'br':
+                continue
+            if match.group(1):
+                self.handle_endtag(tag, raw=True)
+            else:
+                self.handle_starttag(tag, raw=True)
+        self.handle_data(unescape(html[pos:]))
 
-    def handle_starttag(self, tag, attrs):
-        # Flush existing text before starting a block element
-        if tag in ['h1', 'h2', 'h3', 'p', 'ul', 'ol', 'li', 'table', 'blockquote', 'pre']:
-            self.flush()
+    def handle_starttag(self, tag, raw=False):
+        # Flush existing text before starting a block element; inside a list
+        # it is the item's own text, e.g. before a nested list starts
+        if tag in HEADING_TAGS or tag in ['p', 'ul', 'ol', 'li', 'table', 'blockquote', 'pre']:
+            self.flush('li' if self.list_stack else None)
 
         if tag == 'ul':
             self.list_stack.append('ul')
@@ -110,6 +481,9 @@ class CSSStyleParser(HTMLParser):
         elif tag == 'li':
             if self.list_stack and self.list_stack[-1] == 'ol':
                 self.list_counters[-1] += 1
+                self.item_bullet = f"{self.list_counters[-1]}."
+            else:
+                self.item_bullet = "•"
         
         elif tag == 'table':
             self.in_table = True
@@ -117,31 +491,28 @@ class CSSStyleParser(HTMLParser):
         elif tag == 'tr':
             self.curr_row = []
         elif tag in ['td', 'th']:
-            self.curr_cell = []
+            self.curr_cell.seek(0)
+            self.curr_cell.truncate()
+            self.cell_markup = False
             self.in_th = (tag == 'th')
             
         elif tag == 'pre':
             self.in_pre = True
             
-        elif tag == 'code':
+        elif tag in INLINE_TAGS:
             # CSS: :not(pre)>code
-            if not self.in_pre:
-                self.current_text.append(f'<font face="{MONO_FONT}" color="{CODE_INLINE_TEXT}" backColor="{CODE_INLINE_BG}">')
-        
-        elif tag in ['strong', 'b']:
-            self.current_text.append('<b>')
-        elif tag in ['em', 'i']:
-            self.current_text.append('<i>')
+            if not (tag == 'code' and self.in_pre):
+                self.open_inline(*INLINE_TAGS[tag], raw)
             
         elif tag == 'br':
-            if self.in_table:
-                self.curr_cell.append('<br/>')
-            else:
-                self.current_text.append('<br/>')
-
-    def handle_endtag(self, tag):
-        # Flush text when closing block elements
-        if tag in ['h1', 'h2', 'h3', 'p', 'li', 'blockquote', 'pre']:
+            self.markup_buffer().write('<br/>')
+
+    def handle_endtag(self, tag, raw=False):
+        # Flush text when closing block elements; paragraphs of a loose
+        # list are the item's text
+        if tag == 'p' and self.list_stack:
+            self.flush('li')
+        elif tag in HEADING_TAGS or tag in ['p', 'li', 'blockquote', 'pre']:
             self.flush(tag)
 
         if tag == 'ul':
@@ -155,14 +526,9 @@ class CSSStyleParser(HTMLParser):
         elif tag == 'pre':
             self.in_pre = False
             
-        elif tag == 'code':
-            if not self.in_pre:
-                self.current_text.append('</font>')
-                
-        elif tag in ['strong', 'b']:
-            self.current_text.append('</b>')
-        elif tag in ['em', 'i']:
-            self.current_text.append('</i>')
+        elif tag in INLINE_TAGS:
+            if not (tag == 'code' and self.in_pre):
+                self.close_inline(INLINE_TAGS[tag][1], raw)
             
         elif tag == 'table':
             self.build_table()
@@ -170,60 +536,93 @@ class CSSStyleParser(HTMLParser):
         elif tag == 'tr':
             if self.curr_row: self.rows.append(self.curr_row)
         elif tag in ['td', 'th']:
-            content = "".join(self.curr_cell).strip()
-            if not content: content = "&nbsp;"
-            
-            # Select style based on TH or TD
-            style = self.styles['CustomTH'] if self.in_th else self.styles['CustomTD']
-            self.curr_row.append(Paragraph(content, style))
+            self.drop_open_tags()
+            content = self.curr_cell.getvalue().strip()
+            # Cells become flowables in build_table, once the width is known
+            self.curr_row.append((content, self.cell_markup, self.in_th))
+
+    def open_inline(self, start, end, raw):
+        buffer = self.markup_buffer()
+        self.open_tags.append((end, raw, buffer.tell(), len(start)))
+        buffer.write(start)
+
+    def close_inline(self, end, raw):
+        """Closes an inline tag, keeping the markup balanced for ReportLab.
+
+        A raw closing tag only counts if it closes the innermost open tag,
+        opened by raw HTML too; stray ones are dropped. Raw tags still open
+        when a Markdown element closes lose their opening markup.
+        """
+        tags = self.open_tags
+        if raw:
+            if not (tags and tags[-1][0] == end and tags[-1][1]): return
+        else:
+            while tags and tags[-1][1]:
+                self.drop_open_tag()
+            if not tags: return
+        tags.pop()
+        self.markup_buffer().write(end)
+
+    def drop_open_tag(self):
+        """Removes the opening markup of an inline tag that was never closed."""
+        _, _, offset, length = self.open_tags.pop()
+        buffer = self.curr_cell if self.in_table else self.current_text
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        buffer.write(text[:offset] + text[offset + length:])
+
+    def drop_open_tags(self):
+        while self.open_tags:
+            self.drop_open_tag()
+
+    def markup_buffer(self):
+        """Where inserted markup goes; flags the cell or paragraph text."""
+        if self.in_table:
+            self.cell_markup = True
+            return self.curr_cell
+        self.text_markup = True
+        return self.current_text
 
     def handle_data(self, data):
+        # XML Escape for ReportLab, once per chunk of source text; the
+        # markup this parser inserts itself is never escaped.
+        data = data.translate(XML_ESCAPE)
         if self.in_table:
-            self.curr_cell.append(data)
+            self.curr_cell.write(data)
         else:
-            self.current_text.append(data)
-            
-    def handle_entityref(self, name):
-        char = f'&{name};'
-        if self.in_table: self.curr_cell.append(char)
-        else: self.current_text.append(char)
+            self.current_text.write(data)
 
     def flush(self, tag=None):
-        text = "".join(self.current_text).strip()
+        self.drop_open_tags()
+        text = self.current_text.getvalue().strip()
         if not text: return
-        self.current_text = []
-        
-        # XML Escape for ReportLab
-        text = text.replace('&', '&amp;')
-
-        if tag == 'h1':
-            self.story.append(Paragraph(text, self.styles['CustomH1']))
-        elif tag == 'h2':
-            self.story.append(Paragraph(text, self.styles['CustomH2']))
-        elif tag == 'h3':
-            self.story.append(Paragraph(text, self.styles['CustomH3']))
+        self.current_text.seek(0)
+        self.current_text.truncate()
+        # Text without inline markup skips ReportLab's XML parser
+        make_paragraph = markup_paragraph if self.text_markup else plain_paragraph
+        self.text_markup = False
+
+        if tag in HEADING_TAGS:
+            level = ord(tag[1]) - ord('0')
+            self.story.append(make_paragraph(text, self.heading_styles[level]))
         elif tag == 'blockquote':
-            self.story.append(Paragraph(text, self.styles['CustomQuote']))
+            self.story.append(make_paragraph(text, self.styles['CustomQuote']))
         elif tag == 'pre':
             # Handle newlines in code blocks
             text = text.replace('\n', '<br/>')
             self.story.append(Paragraph(text, self.styles['CustomPre']))
         elif tag == 'li':
-            # List Logic
-            level = len(self.list_stack)
-            indent = (level - 1) * 20 + 10
-            if self.list_stack[-1] == 'ol':
-                bullet = f"{self.list_counters[-1]}."
-            else:
-                bullet = "•"
+            # List Logic: the bullet goes on the item's first block only
+            level = min(len(self.list_stack), MAX_LIST_LEVEL)
+            if self.item_bullet:
+                text = f"{self.item_bullet} {text}"
+                self.item_bullet = None
             
-            style = ParagraphStyle(
-                'ListItem', parent=self.styles['CustomBody'],
-                leftIndent=indent+15, firstLineIndent=-15, spaceAfter=2
-            )
-            self.story.append(Paragraph(f"{bullet} {text}", style))
+            style = self.styles[f'CustomBullet{level}']
+            self.story.append(make_paragraph(text, style))
         elif tag == 'p':
-            self.story.append(Paragraph(text, self.styles['CustomBody']))
+            self.story.append(make_paragraph(text, self.styles['CustomBody']))
 
     def build_table(self):
         if not self.rows: return
@@ -233,30 +632,33 @@ class CSSStyleParser(HTMLParser):
         # Calculate width
         avail_width = 17 * cm
         col_width = avail_width / cols
+        text_width = col_width - 12 # LEFTPADDING + RIGHTPADDING
         
-        t = Table(self.rows, colWidths=[col_width]*cols, repeatRows=1)
-        
-        # CSS: border: 1px solid #ddd; th { background-color: #f4f4f4 }
-        style_cmds = [
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.HexColor(TABLE_BORDER)),
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor(TABLE_HEAD_BG)),
-            ('LEFTPADDING', (0,0), (-1,-1), 6),
-            ('RIGHTPADDING', (0,0), (-1,-1), 6),
-            ('TOPPADDING', (0,0), (-1,-1), 6),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 6),
-        ]
-        t.setStyle(TableStyle(style_cmds))
+        data = [[self.build_cell(*cell, text_width) for cell in row] for row in self.rows]
+        t = Table(data, colWidths=[col_width]*cols, repeatRows=1)
+        t.setStyle(TABLE_STYLE)
         self.story.append(Spacer(1, 12))
         self.story.append(t)
         self.story.append(Spacer(1, 12))
 
+    def build_cell(self, content, markup, is_th, width):
+        style = self.styles['CustomTH'] if is_th else self.styles['CustomTD']
+        if not markup:
+            # Plain text that fits on one line is drawn by the table itself
+            # (fonts from TABLE_STYLE), skipping Paragraph parsing and layout;
+            # whitespace collapses as it would in a Paragraph
+            text = ' '.join(unescape(content).split())
+            if pdfmetrics.stringWidth(text, style.fontName, style.fontSize) <= width:
+                return text
+        return markup_paragraph(content or "&nbsp;", style)
+
 # ==========================================
 # 4. STYLES DEFINITION
 # ==========================================
 
+@st.cache_resource
 def get_css_styles():
-    """Create ParagraphStyles that strictly match the CSS provided."""
+    """Create ParagraphStyles that strictly match the CSS provided. Cached across Streamlit reruns."""
     styles = getSampleStyleSheet()
     
     # Base Body
@@ -266,7 +668,7 @@ def get_css_styles():
         fontName=BODY_FONT,
         fontSize=11,
         leading=11 * 1.6, # CSS line-height: 1.6
-        textColor=colors.HexColor(BODY_COLOR),
+        textColor=BODY_COLOR_OBJ,
         spaceAfter=12,
         alignment=TA_LEFT
     ))
@@ -278,7 +680,7 @@ def get_css_styles():
         fontName=HEAD_FONT,
         fontSize=26, # ~2.2em
         leading=32,
-        textColor=colors.HexColor(H1_COLOR),
+        textColor=H1_COLOR_OBJ,
         spaceBefore=24, spaceAfter=12,
         keepWithNext=True
     ))
@@ -289,7 +691,7 @@ def get_css_styles():
         fontName=HEAD_FONT,
         fontSize=22, # ~1.8em
         leading=28,
-        textColor=colors.HexColor(H2_COLOR),
+        textColor=H2_COLOR_OBJ,
         spaceBefore=20, spaceAfter=10,
         keepWithNext=True
     ))
@@ -300,11 +702,24 @@ def get_css_styles():
         fontName=HEAD_FONT,
         fontSize=17, # ~1.4em
         leading=22,
-        textColor=colors.HexColor(H3_COLOR),
+        textColor=H3_COLOR_OBJ,
         spaceBefore=16, spaceAfter=8,
         keepWithNext=True
     ))
 
+    # h4-h6 share the h3 color and step down towards body size
+    for level, size in ((4, 14), (5, 12), (6, 11)):
+        styles.add(ParagraphStyle(
+            name=f'CustomH{level}',
+            parent=styles['Normal'],
+            fontName=HEAD_FONT,
+            fontSize=size,
+            leading=size + 5,
+            textColor=H3_COLOR_OBJ,
+            spaceBefore=12, spaceAfter=6,
+            keepWithNext=True
+        ))
+
     # Blockquote
     styles.add(ParagraphStyle(
         name='CustomQuote',
@@ -312,7 +727,7 @@ def get_css_styles():
         fontName=BODY_FONT,
         fontSize=11,
         leading=11 * 1.6,
-        textColor=colors.HexColor(QUOTE_COLOR),
+        textColor=QUOTE_COLOR_OBJ,
         leftIndent=15, # Indentation
         spaceAfter=12
     ))
@@ -324,8 +739,8 @@ def get_css_styles():
         fontName=MONO_FONT,
         fontSize=10,
         leading=14,
-        textColor=colors.HexColor(PRE_BLOCK_TEXT),
-        backColor=colors.HexColor(PRE_BLOCK_BG),
+        textColor=PRE_BLOCK_TEXT_OBJ,
+        backColor=PRE_BLOCK_BG_OBJ,
         borderPadding=10, # CSS padding
         spaceAfter=12,
         splitLongWords=True
@@ -351,41 +766,195 @@ def get_css_styles():
         alignment=TA_CENTER
     ))
 
+    # List items, one style per nesting level (deeper levels reuse the last)
+    for level in range(1, MAX_LIST_LEVEL + 1):
+        indent = (level - 1) * 20 + 10
+        styles.add(ParagraphStyle(
+            name=f'CustomBullet{level}',
+            parent=styles['CustomBody'],
+            leftIndent=indent + 15,
+            firstLineIndent=-15,
+            spaceAfter=2
+        ))
+
     return styles
 
+# CSS: border: 1px solid #ddd; th { background-color: #f4f4f4 }
+# Identical for every table, so it is built once and shared.
+TABLE_STYLE = TableStyle([
+    ('VALIGN', (0,0), (-1,-1), 'TOP'),
+    ('GRID', (0,0), (-1,-1), 0.5, TABLE_BORDER_OBJ),
+    ('BACKGROUND', (0,0), (-1,0), TABLE_HEAD_BG_OBJ),
+    ('LEFTPADDING', (0,0), (-1,-1), 6),
+    ('RIGHTPADDING', (0,0), (-1,-1), 6),
+    ('TOPPADDING', (0,0), (-1,-1), 6),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+    # Plain-string cells; these match CustomTD / CustomTH
+    ('FONTNAME', (0,0), (-1,-1), BODY_FONT),
+    ('FONTNAME', (0,0), (-1,0), HEAD_FONT),
+    ('FONTSIZE', (0,0), (-1,-1), 10),
+    ('LEADING', (0,0), (-1,-1), 14),
+    ('TEXTCOLOR', (0,0), (-1,-1), colors.black),
+    ('ALIGN', (0,0), (-1,0), 'CENTER'),
+])
+
 # ==========================================
 # 5. MAIN CONVERSION FUNCTION
 # ==========================================
 
-def markdown_to_pdf(md_text):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=2*cm, leftMargin=2*cm,
-        topMargin=2*cm, bottomMargin=2*cm
-    )
+class ReportDocTemplate(BaseDocTemplate):
+    """A4 document with a single frame and a single page template.
+
+    SimpleDocTemplate sets up separate first/later page templates and
+    rebuilds them on every build(); this report needs only one.
+    """
+    def __init__(self, buffer, on_page=add_footer):
+        super().__init__(
+            buffer,
+            pagesize=A4,
+            rightMargin=2*cm, leftMargin=2*cm,
+            topMargin=2*cm, bottomMargin=2*cm,
+            pageCompression=1 # zlib page streams, regardless of rl_config
+        )
+        frame = Frame(self.leftMargin, self.bottomMargin, self.width, self.height, id='normal')
+        self.addPageTemplates([PageTemplate(id='main', frames=[frame], onPage=on_page)])
+
+class BytesSink(RawIOBase):
+    """Write-only file object that keeps the written bytes objects.
+
+    ReportLab hands over the finished PDF in one write, so getvalue() can
+    return that object itself instead of a copy out of a BytesIO.
+    """
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(data)
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def getvalue(self):
+        if len(self.parts) == 1 and type(self.parts[0]) is bytes:
+            return self.parts[0]
+        return b''.join(self.parts)
+
+def render_pdf(md_text, buffer, on_page=add_footer, styles=None):
+    doc = ReportDocTemplate(buffer, on_page=on_page)
     
-    # Preprocess and Convert to HTML
+    # Preprocess and parse into Markdown events
     clean_md = preprocess_markdown(md_text)
-    # 'extra' enables tables, fenced code blocks, etc.
-    html_content = markdown.markdown(clean_md, extensions=['extra'])
+    events = markdown_events(clean_md)
     
-    # Parse HTML to PDF Elements
-    styles = get_css_styles()
-    parser = CSSStyleParser(styles)
-    parser.feed(html_content)
+    # Turn the events into PDF Elements
+    parser = CSSStyleParser(styles or get_css_styles())
+    parser.feed(events)
     
     # Build PDF
-    doc.build(parser.story, onFirstPage=add_footer, onLaterPages=add_footer)
-    
-    buffer.seek(0)
-    return buffer
+    doc.build(parser.story)
+
+def render_chunk(md_text):
+    buffer = BytesSink()
+    render_pdf(md_text, buffer, on_page=no_footer)
+    return buffer.getvalue()
+
+def render_chunked_pdf(chunks, buffer):
+    """Renders the chunks of a large document in parallel, merged with pypdf.
+
+    Layout holds the GIL, so the chunks go to worker processes. Each chunk
+    starts on a new page; the footers are stamped once all pages are merged
+    so the page numbers stay continuous.
+    """
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        parts = list(pool.map(render_chunk, chunks))
+
+    writer = pypdf.PdfWriter()
+    for part in parts:
+        writer.append(BytesIO(part))
+
+    footers = BytesIO()
+    canvas = Canvas(footers, pagesize=A4)
+    for page_number in range(1, len(writer.pages) + 1):
+        draw_footer(canvas, page_number)
+        canvas.showPage()
+    canvas.save()
+    for page, footer in zip(writer.pages, pypdf.PdfReader(footers).pages):
+        page.merge_page(footer)
+        # Merging leaves the page's content stream uncompressed
+        page.compress_content_streams()
+
+    writer.write(buffer)
+
+def markdown_to_pdf(md_text, chunked=False, styles=None):
+    """Returns the finished PDF as bytes.
+
+    chunked=True renders long documents in parallel worker processes; it only
+    pays off with several cores, and needs this file imported as a module.
+    styles defaults to get_css_styles().
+    """
+    buffer = BytesSink()
+    chunks = [md_text]
+    if chunked and pypdf is not None and len(md_text) >= CHUNK_MIN_CHARS:
+        chunks = split_markdown(md_text, os.cpu_count() or 1)
+    if len(chunks) > 1:
+        render_chunked_pdf(chunks, buffer)
+    else:
+        render_pdf(md_text, buffer, styles=styles)
+    return buffer.getvalue()
+
+def markdown_to_pdfs(md_texts):
+    """Converts a batch of documents, returning their PDFs in the same order.
+
+    Layout holds the GIL, so the documents are spread over worker processes;
+    each worker imports this module and sets up fonts and styles once.
+    """
+    with ProcessPoolExecutor() as pool:
+        return list(pool.map(markdown_to_pdf, md_texts))
+
+@st.cache_resource
+def get_pdf_pool():
+    """Worker threads shared by all sessions. Cached across Streamlit reruns."""
+    return ThreadPoolExecutor(max_workers=os.cpu_count())
+
+def submit_pdf(md_text):
+    """Runs markdown_to_pdf on the worker pool and returns its Future.
+
+    Styles are resolved here: pool threads have no ScriptRunContext.
+    """
+    return get_pdf_pool().submit(markdown_to_pdf, md_text, styles=get_css_styles())
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def cached_pdf(md_text):
+    """PDF bytes for the text, built once per unique input across reruns."""
+    return submit_pdf(md_text).result()
 
 # ==========================================
 # 6. STREAMLIT UI
 # ==========================================
 
+# Preview styles matching the PDF, formatted once from the color constants
+PREVIEW_CSS = f"""
+<style>
+    h1 {{ color: {H1_COLOR} !important; border-bottom: 2px solid #eee; padding-bottom: 0.5rem; }}
+    h2 {{ color: {H2_COLOR} !important; }}
+    h3 {{ color: {H3_COLOR} !important; }}
+    p {{ line-height: 1.6; color: {BODY_COLOR}; }}
+    code {{ background-color: {CODE_INLINE_BG}; color: {CODE_INLINE_TEXT}; padding: 2px 4px; border-radius: 3px; }}
+    pre {{ background-color: {PRE_BLOCK_BG}; padding: 10px; border-radius: 4px; }}
+    pre code {{ color: {PRE_BLOCK_TEXT}; background-color: transparent; }}
+    blockquote {{ border-left: 4px solid #ddd; padding-left: 1em; color: {QUOTE_COLOR}; }}
+    th {{ background-color: {TABLE_HEAD_BG}; border: 1px solid {TABLE_BORDER}; }}
+    td {{ border: 1px solid {TABLE_BORDER}; }}
+</style>
+"""
+
 def main():
     st.set_page_config(page_title="CSS Styled PDF Generator", layout="wide")
     
@@ -428,31 +997,21 @@ Inline code looks like `api_key = "123"` and `user_id`.
 
     with col2:
         st.subheader("👁️ Preview (Styled)")
-        # Injecting CSS to make the preview match the PDF output
-        st.markdown(f"""
-        <style>
-            h1 {{ color: {H1_COLOR} !important; border-bottom: 2px solid #eee; padding-bottom: 0.5rem; }}
-            h2 {{ color: {H2_COLOR} !important; }}
-            h3 {{ color: {H3_COLOR} !important; }}
-            p {{ line-height: 1.6; color: {BODY_COLOR}; }}
-            code {{ background-color: {CODE_INLINE_BG}; color: {CODE_INLINE_TEXT}; padding: 2px 4px; border-radius: 3px; }}
-            pre {{ background-color: {PRE_BLOCK_BG}; padding: 10px; border-radius: 4px; }}
-            pre code {{ color: {PRE_BLOCK_TEXT}; background-color: transparent; }}
-            blockquote {{ border-left: 4px solid #ddd; padding-left: 1em; color: {QUOTE_COLOR}; }}
-            th {{ background-color: {TABLE_HEAD_BG}; border: 1px solid {TABLE_BORDER}; }}
-            td {{ border: 1px solid {TABLE_BORDER}; }}
-        </style>
-        """, unsafe_allow_html=True)
+        # Injecting CSS to make the preview match the PDF output. A style-only
+        # st.html goes to the event container, so it takes no space. It is
+        # sent on every run: elements a rerun skips are removed from the page.
+        st.html(PREVIEW_CSS)
         st.markdown(md_input, unsafe_allow_html=True)
 
     st.divider()
 
     if st.button("⬇️ Generate PDF", type="primary"):
         try:
-            pdf_file = markdown_to_pdf(md_input)
+            with st.spinner("Building PDF..."):
+                pdf_bytes = cached_pdf(md_input)
             st.download_button(
                 label="Download Final PDF",
-                data=pdf_file,
+                data=pdf_bytes,
                 file_name="styled_report.pdf",
                 mime="application/pdf"
             )
@@ -0,0 +1,63 @@
+import pytest
+from reportlab.platypus import Paragraph, Table
+
+import markdowntopdf
+
+
+def paragraph_texts(md_text):
+    """Texts of the Paragraphs built for md_text, in story order."""
+    parser = markdowntopdf.CSSStyleParser(markdowntopdf.get_css_styles())
+    parser.feed(markdowntopdf.markdown_events(markdowntopdf.preprocess_markdown(md_text)))
+    return [flowable.text for flowable in parser.story if isinstance(flowable, Paragraph)]
+
+
+def test_nested_list_keeps_parent_items():
+    assert paragraph_texts("- a\n    - b\n- c\n") == ["• a", "• b", "• c"]
+    assert paragraph_texts("1. one\n    1. sub\n2. two\n") == ["1. one", "1. sub", "2. two"]
+
+
+def test_deeply_nested_list_keeps_every_level():
+    md_text = "".join("    " * level + f"- item{level}\n" for level in range(10))
+    assert paragraph_texts(md_text) == [f"• item{level}" for level in range(10)]
+
+
+def test_loose_list_items_get_bullets():
+    assert paragraph_texts("- a\n\n- b\n\n  more\n") == ["• a", "• b", "more"]
+
+
+def test_inline_html_comments_are_dropped():
+    assert paragraph_texts("Text <!-- hidden --> more") == ["Text more"]
+    assert paragraph_texts("<!--\nblock\ncomment\n-->\n\npara") == ["para"]
+
+
+def test_unbalanced_inline_html_does_not_break_the_pdf():
+    for md_text in ["a <b>b", "a </b> b", "**a <i>b** c</i> d", "| h |\n|---|\n| a <b>b |\n",
+                    "text </ul> more", "- item </ol>\n"]:
+        assert markdowntopdf.markdown_to_pdf(md_text).startswith(b"%PDF")
+    assert paragraph_texts("Use <pre> for code\n\nand <table> too\n\nlast") == [
+        "Use for code", "and too", "last"]
+    assert paragraph_texts("x <b>bold</b> y") == ["x <b>bold</b> y"]
+
+
+def test_entities_decode_like_commonmark_in_both_parsers():
+    mistune = pytest.importorskip("mistune")
+    parse_mistune = mistune.create_markdown(renderer="ast", plugins=["table", "strikethrough", "task_lists"])
+    cases = {
+        "x &copy2024": "x &copy2024",
+        "I'm &notin z": "I'm &notin z",
+        "a &notit; b": "a &notit; b",
+        "?a=1&copy=2": "?a=1&copy=2",
+        "&copy; &#65; &#x42; &amp;": "© A B &",
+    }
+    for md_text, expected in cases.items():
+        for events in (markdowntopdf.markdown_events(md_text),
+                       markdowntopdf.mistune_events(parse_mistune(md_text))):
+            text = "".join(event["Text"] for event in events if isinstance(event, dict) and "Text" in event)
+            assert text == expected
+
+
+def test_plain_table_cells_collapse_whitespace():
+    parser = markdowntopdf.CSSStyleParser(markdowntopdf.get_css_styles())
+    parser.feed(markdowntopdf.markdown_events("| Role |\n|---|\n| QA  Engineer\t x |\n"))
+    table = next(flowable for flowable in parser.story if isinstance(flowable, Table))
+    assert table._cellvalues[1][0] == "QA Engineer x"